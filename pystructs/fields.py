@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
+import struct
+
+
 class StructFieldDescriptor:
     """Generic descriptor type for defining a formatted struct field"""
+    __slots__ = ('name', 'count', 'sizeof', 'val', 'format', '_slice_size')
     fmt = typ = ctype = None
     size = 0
 
@@ -10,9 +14,11 @@ class StructFieldDescriptor:
 
         # if we have a callback to determine our size, then set a default size
         # of 1 so we can rely on our count to determine how many bytes we're
-        # unpacking
-        if self.sizeof is not None and self.size is 0:
+        # unpacking. Every built-in field type declares a static size, so this
+        # only ever writes to custom field types that leave it unset
+        if sizeof is not None and type(self).size == 0:
             self.size = 1
+        self.freeze()
 
     def __get__(self, instance, instance_type):
         return self.val
@@ -28,30 +34,64 @@ class StructFieldDescriptor:
         return '<%s> %d' % (self.ctype, self.size)
     __repr__ = __str__
 
-    @property
-    def format(self):
-        return '%d%s' % (self.count, self.fmt)
+    def freeze(self):
+        """Store this field's format string and size in bytes as plain
+        attributes. Must be called again whenever this field's count changes
+        """
+        # a count of 1 is implied by a bare format character
+        if self.count == 1:
+            self.format = self.fmt
+        else:
+            self.format = '%d%s' % (self.count, self.fmt)
+        self._slice_size = self.size * self.count
+
+    def _pack_values(self, data):
+        """Append the value(s) held by this field to the `data` list of values
+        being packed
+
+        :param data: The list of values being packed
+        """
+        if self.count == 1:
+            data.append(self.val)
+        else:
+            data.extend(self.val)
 
 
 class PadByteField(StructFieldDescriptor):
     """A padding byte. Does not map to a specific Python type and is
     effectively thrown away once parsed
     """
+    __slots__ = ()
     fmt = 'x'
     typ = type(None)
+    size = 1
     ctype = 'pad byte'
 
+    def _pack_values(self, data):
+        """Padding bytes do not consume any values when packed"""
+
 
 class CharField(StructFieldDescriptor):
     """A single C char type. Will be loaded as a bytes object of length 1"""
+    __slots__ = ()
     fmt = 'c'
     typ = bytes
     size = 1
     ctype = 'char'
 
+    def _pack_values(self, data):
+        """Chars unpack as a tuple of length 1 :const:`bytes` objects, but may
+        also have been assigned a single :const:`bytes` object
+        """
+        if isinstance(self.val, bytes):
+            data.append(self.val)
+        else:
+            data.extend(self.val)
+
 
 class SignedCharField(StructFieldDescriptor):
     """A signed C char type. Will be loaded as an integer value"""
+    __slots__ = ()
     fmt = 'b'
     typ = int
     size = 1
@@ -60,6 +100,7 @@ class SignedCharField(StructFieldDescriptor):
 
 class UnsignedCharField(SignedCharField):
     """An unsigned C char type. Will be loaded as an integer value"""
+    __slots__ = ()
     fmt = 'B'
     ctype = 'unsigned char'
 
@@ -69,6 +110,7 @@ class BooleanField(StructFieldDescriptor):
     current system, then it will be simulated using a char. In standard mode,
     it is always represented as a single byte
     """
+    __slots__ = ()
     fmt = '?'
     typ = bool
     size = 1
@@ -76,6 +118,7 @@ class BooleanField(StructFieldDescriptor):
 
 
 class ShortField(StructFieldDescriptor):
+    __slots__ = ()
     fmt = 'h'
     typ = int
     size = 2
@@ -83,11 +126,13 @@ class ShortField(StructFieldDescriptor):
 
 
 class UnsignedShort(ShortField):
+    __slots__ = ()
     fmt = 'H'
     ctype = 'unsigned short'
 
 
 class IntegerField(StructFieldDescriptor):
+    __slots__ = ()
     fmt = 'i'
     typ = int
     size = 4
@@ -95,32 +140,38 @@ class IntegerField(StructFieldDescriptor):
 
 
 class UnsignedIntegerField(IntegerField):
+    __slots__ = ()
     fmt = 'I'
     ctype = 'unsigned int'
 
 
 class LongField(IntegerField):
+    __slots__ = ()
     fmt = 'l'
     ctype = 'long'
 
 
 class UnsignedLongField(LongField):
+    __slots__ = ()
     fmt = 'L'
     ctype = 'unsigned long'
 
 
 class LongLongField(LongField):
+    __slots__ = ()
     fmt = 'q'
     size = 8
     ctype = 'long long'
 
 
 class UnsignedLongLongField(LongLongField):
+    __slots__ = ()
     fmt = 'Q'
     ctype = 'unsigned long long'
 
 
 class SSizeTField(StructFieldDescriptor):
+    __slots__ = ()
     fmt = 'n'
     typ = int
     size = 8
@@ -128,11 +179,13 @@ class SSizeTField(StructFieldDescriptor):
 
 
 class SSizeTField(SSizeTField):
+    __slots__ = ()
     fmt = 'N'
     ctype = 'size_t'
 
 
 class FloatField(StructFieldDescriptor):
+    __slots__ = ()
     fmt = 'f'
     typ = float
     size = 4
@@ -140,6 +193,7 @@ class FloatField(StructFieldDescriptor):
 
 
 class DoubleField(StructFieldDescriptor):
+    __slots__ = ()
     fmt = 'd'
     typ = float
     size = 8
@@ -147,20 +201,37 @@ class DoubleField(StructFieldDescriptor):
 
 
 class CharArrayField(StructFieldDescriptor):
+    __slots__ = ('encoding',)
     fmt = 's'
     typ = bytes
+    size = 1
     ctype = 'char[]'
 
     def __init__(self, name=None, count=1, sizeof=None, encoding=None):
         super(self.__class__, self).__init__(name, count, sizeof)
         self.encoding = encoding
 
+    def _pack_values(self, data):
+        """char[] types pack as a single :const:`bytes` object, encoding `str`
+        values using this field's encoding. Values that were not decoded when
+        unpacked are held in a tuple of length 1
+        """
+        if isinstance(self.val, str):
+            data.append(bytes(self.val, self.encoding or 'utf-8'))
+        elif isinstance(self.val, tuple):
+            data.extend(self.val)
+        else:
+            data.append(self.val)
+
 
 class CharArrayField2(CharArrayField):
+    __slots__ = ()
     fmt = 'p'
     ctype = 'char[]'
 
 
 class VoidPointerField(StructFieldDescriptor):
+    __slots__ = ()
     fmt = 'P'
+    size = struct.calcsize('P')
     ctype = 'void *'
@@ -1,8 +1,7 @@
 # -*- coding: utf-8 -*-
 """Data model objects for the Structs API"""
-import logging
 import struct
-from collections import OrderedDict, Iterable
+from functools import lru_cache
 from pystructs.fields import StructFieldDescriptor
 from pystructs.utils import StatefulByteStream
 
@@ -12,47 +11,258 @@ LittleEndianByteOrder = '<'
 BigEndianByteOrder = '>'
 NetworkByteOrder = '!'
 
+#: Return the compiled :class:`struct.Struct` for a full format string. Shared
+#: by every :class:`StructObject` subclass so each format is parsed only once.
+#: Only used for formats known when a class is built, so it stays small
+_compile = lru_cache(maxsize=None)(struct.Struct)
+
+#: Return the compiled :class:`struct.Struct` for a dynamically sized field's
+#: format. Its count comes from the data being unpacked, so the cache is
+#: bounded to keep untrusted input from growing it without limit
+_compile_dynamic = lru_cache(maxsize=128)(struct.Struct)
+
+#: The :class:`StructObject` methods replaced by generated code
+_GENERATED_METHODS = ('unpack', 'pack_into', '_packed_size')
+
+
+def _is_static(field):
+    """Return whether or not the size of `field` is known at class creation
+    time, ie. whether it can be folded into a precompiled
+    :class:`struct.Struct`
+    """
+    return field.sizeof is None and not isinstance(field, StructObject)
+
+
+def _value_count(field):
+    """Return the number of values that unpacking `field` will produce"""
+    if field.fmt == 'x':
+        return 0
+    if field.fmt in ('s', 'p'):
+        return 1
+    return field.count
+
+
+def _compile_fields(fields, byte_order):
+    """Partition `fields` into runs of statically sized fields, each of which
+    is backed by a single precompiled :class:`struct.Struct`. Dynamically
+    sized fields are left as runs of their own with no compiled
+    :class:`struct.Struct`
+
+    :param fields: The ordered :class:`StructFieldDescriptor` instances
+    :param byte_order: The byte order of the owning :class:`StructObject`
+    :return: A list of `(run, compiled, slices)` tuples, where `slices` maps
+        each field in `run` onto its `(start, stop, unwrap)` position in the
+        unpacked values. For dynamically sized runs `compiled` is None and
+        `slices` instead flags whether the field is a nested
+        :class:`StructObject`
+    """
+    compiled, run = [], []
+
+    def flush():
+        if not run:
+            return
+        slices, start = [], 0
+        for field in run:
+            stop = start + _value_count(field)
+            unwrap = (field.count == 1 and field.typ is not bytes and
+                      stop - start == 1)
+            slices.append((start, stop, unwrap))
+            start = stop
+        fmt = byte_order + ''.join(field.format for field in run)
+        compiled.append((tuple(run), _compile(fmt), tuple(slices)))
+        del run[:]
+
+    for field in fields:
+        if _is_static(field):
+            run.append(field)
+        else:
+            flush()
+            compiled.append(((field,), None, isinstance(field, StructObject)))
+    flush()
+    return compiled
+
+
+def _field_values(field):
+    """Return the list of values `field` contributes when packed"""
+    data = []
+    field._pack_values(data)
+    return data
+
+
+def _generate_methods(cls):
+    """Generate straight-line `unpack`, `pack_into` and `_packed_size`
+    methods specialized to the compiled field layout of `cls`, removing the
+    per-record loop and branching of the generic :class:`StructObject`
+    implementations
+
+    :param cls: The :class:`StructObject` subclass to generate methods for
+    :return: A dict mapping method names to the generated functions
+    """
+    namespace = {'StatefulByteStream': StatefulByteStream,
+                 '_field_values': _field_values}
+    unpack = ['def unpack(self, stream):',
+              '    if not isinstance(stream, StatefulByteStream):',
+              '        stream = StatefulByteStream(stream)']
+    pack_into = ['def pack_into(self, buf, offset):']
+    sizes, static_size = [], 0
+
+    for index, (run, compiled, slices) in enumerate(cls._compiled):
+        if compiled is None:
+            field = '_f%d_0' % index
+            namespace[field] = run[0]
+            if slices:  # a nested StructObject
+                unpack.append('    %s.val = %s.unpack(stream)' %
+                              (field, field))
+                pack_into.append('    offset = %s.pack_into(buf, offset)' %
+                                 field)
+                sizes.append('%s._packed_size()' % field)
+            else:
+                unpack.append('    self._unpack_sizeof(%s, stream)' % field)
+                pack_into.append(
+                    '    offset = self._pack_sizeof_into(%s, buf, offset)' %
+                    field)
+                sizes.append('self._struct_for(%s).size' % field)
+            continue
+
+        name = '_s%d' % index
+        namespace[name] = compiled
+        static_size += compiled.size
+        unpack.append('    _v = %s.unpack_from(stream.view, stream.offset)' %
+                      name)
+        unpack.append('    stream.offset += %d' % compiled.size)
+        args = []
+        for position, (field, (start, stop, unwrap)) in enumerate(
+                zip(run, slices)):
+            field_name = '_f%d_%d' % (index, position)
+            namespace[field_name] = field
+            if unwrap:
+                unpack.append('    %s.val = _v[%d]' % (field_name, start))
+            else:
+                unpack.append('    %s.val = _v[%d:%d]' %
+                              (field_name, start, stop))
+
+            if start == stop:
+                continue
+            elif type(field)._pack_values is not \
+                    StructFieldDescriptor._pack_values:
+                args.append('*_field_values(%s)' % field_name)
+            elif field.count == 1:
+                args.append('%s.val' % field_name)
+            else:
+                args.append('*%s.val' % field_name)
+        pack_into.append('    %s.pack_into(buf, offset, %s)' %
+                         (name, ', '.join(args)))
+        pack_into.append('    offset += %d' % compiled.size)
+
+    unpack.append('    return self')
+    pack_into.append('    return offset')
+    packed_size = ['def _packed_size(self):',
+                   '    return %s' % ' + '.join([str(static_size)] + sizes)]
+
+    methods = {}
+    for lines in (unpack, pack_into, packed_size):
+        method = lines[0][4:lines[0].index('(')]
+        code = compile('\n'.join(lines) + '\n',
+                       '<%s.%s>' % (cls.__qualname__, method), 'exec')
+        exec(code, namespace)
+        func = namespace.pop(method)
+        func.__qualname__ = '%s.%s' % (cls.__qualname__, method)
+        func.__doc__ = getattr(StructObject, method).__doc__
+        methods[method] = func
+    return methods
+
 
 class StructObjectMeta(type):
     """Metaclass for flagging the descriptors of implementing classes"""
 
     @classmethod
     def __prepare__(cls, name, bases):
-        """Use an :const:`OrderedDict` to prepare the subclass's class dict
-        with in order to preserve the order in which the fields were described.
-        This ensures that the class representation of structured binary data
-        can unpack correctly
+        """Use a :const:`dict`, which preserves insertion order, to prepare the
+        subclass's class dict with in order to preserve the order in which the
+        fields were described. This ensures that the class representation of
+        structured binary data can unpack correctly
         """
-        return OrderedDict()
+        return {}
 
     def __new__(cls, clsname, bases, clsdict):
         """Map the attribute name to the name of the corresponding descriptor
-        instances and store all descriptor names in a _fields attribute for
-        faster inspections
+        instances and store all descriptor names in a _fields attribute, and
+        the descriptors themselves in a _field_objs attribute, for faster
+        inspections
         """
         fields = [key for key, val in clsdict.items()
                   if isinstance(val, StructFieldDescriptor)]
         for name in fields:
             clsdict[name].name = name
         clsdict['_fields'] = fields
+        clsdict['_field_objs'] = tuple(clsdict[name] for name in fields)
+
+        new_cls = super().__new__(cls, clsname, bases, clsdict)
+        new_cls._build()
+        return new_cls
 
-        return super().__new__(cls, clsname, bases, dict(clsdict))
+    def __setattr__(cls, name, value):
+        """Recompile the field layout of this class, and of any subclasses
+        inheriting its byte order, whenever `BYTE_ORDER` is reassigned
+        """
+        super().__setattr__(name, value)
+        if name == 'BYTE_ORDER':
+            cls._build()
+
+    def _build(cls):
+        """Compile the field layout and, unless `CODEGEN` is disabled, the
+        specialized methods of this class for its current `BYTE_ORDER`
+        """
+        # bypass __setattr__ so setting these never triggers a recompile
+        type.__setattr__(cls, '_byte_order', cls.BYTE_ORDER)
+        type.__setattr__(cls, '_compiled',
+                         _compile_fields(cls._field_objs, cls._byte_order))
+
+        # StructObject itself only provides the generic implementations
+        if any(isinstance(base, StructObjectMeta) for base in cls.__bases__):
+            if cls.CODEGEN:
+                methods = _generate_methods(cls)
+            else:
+                methods = {name: getattr(StructObject, name)
+                           for name in _GENERATED_METHODS}
+            for name, method in methods.items():
+                type.__setattr__(cls, name, method)
+
+        for subclass in cls.__subclasses__():
+            if 'BYTE_ORDER' not in subclass.__dict__:
+                subclass._build()
 
 
 class StructObject(StructFieldDescriptor, metaclass=StructObjectMeta):
     """Base class for class representations of structured binary data"""
+    __slots__ = ()
     #: Byte Ordering scheme to use for this class's binary data. Default is
-    #: :const:`NativeByteOrder`
+    #: :const:`NativeByteOrder`. Changing it on the class recompiles the
+    #: class; setting it on an instance raises an :class:`AttributeError`
     BYTE_ORDER = NetworkByteOrder
 
-    @property
-    def __fields(self):
-        """Dynamic accessors which returns access to all field descriptors"""
-        return [self.__class__.__dict__[f] for f in self.__class__._fields]
+    #: Whether to generate `unpack` and `pack` code specialized to each
+    #: class's fields. Set to False to use the generic, field-by-field
+    #: implementations instead, which can be easier to debug
+    CODEGEN = True
+
+    def __setattr__(self, name, value):
+        """Reject per-instance byte orders, since a class's fields are
+        compiled for the byte order of the class as a whole
+        """
+        if name == 'BYTE_ORDER':
+            raise AttributeError('BYTE_ORDER must be set on the %s class, not '
+                                 'on an instance' % type(self).__qualname__)
+        super().__setattr__(name, value)
+
+    def freeze(self):
+        """A :class:`StructObject`'s format is derived from its own fields, so
+        there is nothing to cache
+        """
 
     @property
     def size(self):
-        return sum(f.size for f in self.__fields)
+        return sum(f.size for f in self._field_objs)
 
     @property
     def ctype(self):
@@ -60,24 +270,37 @@ class StructObject(StructFieldDescriptor, metaclass=StructObjectMeta):
 
     @property
     def format(self):
-        return ''.join(f.format for f in self.__fields)
+        return ''.join(f.format for f in self._field_objs)
+
+    def _struct_for(self, field):
+        """Return the compiled :class:`struct.Struct` for `field`'s current
+        format in this class's byte order
+
+        :param field: The :class:`StructFieldDescriptor` to get a
+            :class:`struct.Struct` for
+        """
+        return _compile_dynamic(self._byte_order + field.format)
 
     def _unpack_sizeof(self, field, stream):
         """handle unpacking a :class:`StructFieldDescriptor` that has a sizeof
         callback
 
         :param field: The :class:`StructFieldDescriptor` to unpack
-        :param stream: A :const:`bytes` object to extract data from
+        :param stream: A :class:`StatefulByteStream` to extract data from
         """
         field.count = field.sizeof(self)
-        field.val = struct.unpack(
-            self.BYTE_ORDER + field.format,
-            stream.slice(field.size*field.count)
-        )
+        field.freeze()
+        compiled = self._struct_for(field)
+        field.val = compiled.unpack_from(stream.view, stream.offset)
+        stream.offset += compiled.size
         # for char[] types, unless the encoding is set to None, decode
         # the field.val tuple using the specified encoding
         if field.typ is bytes and field.encoding is not None:
             field.val = field.val[0].decode(field.encoding)
+        # if we unpacked something that was not a collection or a byte
+        # string, remove the single element from it's containing tuple
+        elif field.count == 1 and field.typ is not bytes:
+            field.val = field.val[0]
 
     def unpack(self, stream):
         """unpack the provided binary data stream into this class's fields
@@ -90,20 +313,18 @@ class StructObject(StructFieldDescriptor, metaclass=StructObjectMeta):
             stream = StatefulByteStream(stream)
 
         # map unpacked values to the fields that they correspond to
-        for field in self.__fields:
-            fmt = self.BYTE_ORDER + field.format
-            slice_size = field.size * field.count
-            if isinstance(field, StructObject):
-                field.val = field.unpack(stream.slice(slice_size))
-            elif field.sizeof is not None:
-                self._unpack_sizeof(field, stream)
-            else:
-                field.val = struct.unpack(fmt, stream.slice(slice_size))
+        for run, compiled, slices in self._compiled:
+            if compiled is None:
+                if slices:  # a nested StructObject
+                    run[0].val = run[0].unpack(stream)
+                else:
+                    self._unpack_sizeof(run[0], stream)
+                continue
 
-            # if we unpacked something that was not a collection or a byte
-            # string, remove the single element from it's containing tuple
-            if field.count == 1 and field.typ is not bytes and isinstance(field.val, tuple):
-                field.val = field.val[0]
+            vals = compiled.unpack_from(stream.view, stream.offset)
+            stream.offset += compiled.size
+            for field, (start, stop, unwrap) in zip(run, slices):
+                field.val = vals[start] if unwrap else vals[start:stop]
 
         # return the current instance from unpack to facilitate chaining
         # :class:`StructObject` instances
@@ -116,16 +337,58 @@ class StructObject(StructFieldDescriptor, metaclass=StructObjectMeta):
         :return: The packed :const:`bytes` representation of this
             :class:`StructObject`
         """
-        fmtstr = self.BYTE_ORDER
-        data = []
-        for field in self.__fields:
-            fmtstr += field.format
-            if isinstance(field.val, StructObject):
-                data.extend([f.val for f in field.__fields])
-            elif isinstance(field.val, str):
-                data.append(bytes(field.val, field.encoding or 'utf-8'))
-            elif isinstance(field.val, Iterable) and not isinstance(field.val, bytes):
-                data.extend(field.val)
+        buf = bytearray(self._packed_size())
+        self.pack_into(buf, 0)
+        return bytes(buf)
+
+    def pack_into(self, buf, offset):
+        """Pack this :class:`StructObject` into the writable buffer `buf`,
+        starting at `offset`
+
+        :param buf: A writable buffer, such as a :const:`bytearray`
+        :param offset: The position in `buf` to begin writing at
+        :return: The offset immediately following the packed data
+        """
+        for run, compiled, nested in self._compiled:
+            if compiled is None:
+                if nested:
+                    offset = run[0].pack_into(buf, offset)
+                else:
+                    offset = self._pack_sizeof_into(run[0], buf, offset)
+                continue
+
+            data = []
+            for field in run:
+                field._pack_values(data)
+            compiled.pack_into(buf, offset, *data)
+            offset += compiled.size
+        return offset
+
+    def _packed_size(self):
+        """Return the number of bytes that packing this :class:`StructObject`
+        with its current field values will produce
+        """
+        total = 0
+        for run, compiled, nested in self._compiled:
+            if compiled is not None:
+                total += compiled.size
+            elif nested:
+                total += run[0]._packed_size()
             else:
-                data.append(field.val)
-        return struct.pack(fmtstr, *data)
+                total += self._struct_for(run[0]).size
+        return total
+
+    def _pack_sizeof_into(self, field, buf, offset):
+        """Pack a :class:`StructFieldDescriptor` that has a sizeof callback
+        into `buf` at `offset`
+
+        :param field: The :class:`StructFieldDescriptor` to pack
+        :param buf: A writable buffer, such as a :const:`bytearray`
+        :param offset: The position in `buf` to begin writing at
+        :return: The offset immediately following the packed field
+        """
+        data = []
+        field._pack_values(data)
+        compiled = self._struct_for(field)
+        compiled.pack_into(buf, offset, *data)
+        return offset + compiled.size
@@ -12,33 +12,39 @@ class StatefulByteStream:
         :param stream: A :const:`bytes` object to maintain the state of
         """
         self.data = stream
+        if isinstance(stream, memoryview):
+            self.view = stream
+        else:
+            self.view = memoryview(stream).cast('B')
         self.offset = 0
 
     def slice(self, size, start=0):
-        """Return a slice of this Byte stream
+        """Return a zero-copy :class:`memoryview` slice of this Byte stream
 
         :param size: The size of the slice to cut
         :param start: The start index (relative to the current position in this
             bytestream) to create the slice from
         """
-        to_ret = self.data[self.offset+start:self.offset+size]
+        to_ret = self.view[self.offset+start:self.offset+size]
         self.offset += size
         return to_ret
 
     def __getitem__(self, key):
-        return self.data[key]
+        return self.view[key]
 
     def __len__(self):
-        return self.data.__len__()
+        return len(self.view)
 
     def __str__(self):
         return self.data.__str__()
 
     def __bytes__(self):
-        return self.data
+        if isinstance(self.data, bytes):
+            return self.data
+        return self.view.tobytes()
 
     def __eq__(self, other):
-        return self.data.__eq__(other)
+        return self.view == other
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
+import struct
+
+import pytest
+
 from pystructs import fields
-from pystructs.models import StructObject
+from pystructs.models import StructObject, _compile_dynamic
 
 
 def test_simple_object():
@@ -71,3 +75,181 @@ def test_dependant():
     assert vls.length == 6
     assert vls.string_data == 'foobar'
     assert vls.pack() == data
+
+
+def test_static_after_dependant():
+    """test that statically sized fields following a dynamically sized field
+    are unpacked from the correct offset
+    """
+    class Record(StructObject):
+        length = fields.IntegerField()
+        string_data = fields.CharArrayField(encoding='utf-8',
+                                            sizeof=lambda x: x.length)
+        shorts = fields.ShortField(count=2)
+        flag = fields.BooleanField()
+
+    data = b'\x00\x00\x00\x03foo\x00\x01\x00\x02\x01'
+
+    record = Record()
+    record.unpack(data)
+
+    assert record.length == 3
+    assert record.string_data == 'foo'
+    assert record.shorts == (1, 2)
+    assert record.flag is True
+    assert record.pack() == data
+
+
+def test_nested_dependant():
+    """test that a nested struct object containing a dynamically sized field
+    consumes the correct number of bytes from its parent's stream
+    """
+    class Name(StructObject):
+        length = fields.UnsignedCharField()
+        value = fields.CharArrayField(encoding='utf-8',
+                                      sizeof=lambda x: x.length)
+
+    class Entry(StructObject):
+        name = Name()
+        age = fields.UnsignedShort()
+
+    data = b'\x03bob\x00\x2a'
+
+    entry = Entry()
+    entry.unpack(data)
+
+    assert entry.name.value == 'bob'
+    assert entry.age == 42
+    assert entry.pack() == data
+
+
+def test_pack_into():
+    """test packing a struct object into an existing buffer at an offset"""
+    class Example(StructObject):
+        shorts = fields.ShortField(count=2)
+        long_data = fields.LongField()
+
+    data = b'\x00\x01\x00\x02\x00\x00\x00\x03'
+    ex = Example()
+    ex.unpack(data)
+
+    buf = bytearray(10)
+    assert ex.pack_into(buf, 2) == 10
+    assert bytes(buf) == b'\x00\x00' + data
+
+
+def test_chars_and_padding():
+    """test that char and padding fields round trip through pack"""
+    class Tagged(StructObject):
+        tag = fields.CharField()
+        pad = fields.PadByteField()
+        code = fields.CharField(count=2)
+
+    data = b'a\x00bc'
+
+    tagged = Tagged()
+    tagged.unpack(data)
+
+    assert tagged.tag == (b'a',)
+    assert tagged.code == (b'b', b'c')
+    assert tagged.pack() == data
+
+    tagged.tag = b'z'
+    assert tagged.pack() == b'z\x00bc'
+
+
+def test_generic_implementation():
+    """test that disabling code generation falls back to the generic
+    implementations, which unpack and pack identically
+    """
+    class Name(StructObject):
+        CODEGEN = False
+        length = fields.UnsignedCharField()
+        value = fields.CharArrayField(encoding='utf-8',
+                                      sizeof=lambda x: x.length)
+
+    class Entry(StructObject):
+        CODEGEN = False
+        name = Name()
+        age = fields.UnsignedShort()
+        tag = fields.CharArrayField(count=2)
+
+    data = b'\x03bob\x00\x2aok'
+
+    entry = Entry()
+    entry.unpack(data)
+
+    assert Entry.unpack is StructObject.unpack
+    assert entry.name.value == 'bob'
+    assert entry.age == 42
+    assert entry.tag == (b'ok',)
+    assert entry.pack() == data
+
+
+def test_byte_order_reassigned():
+    """test that reassigning BYTE_ORDER after the class is defined applies to
+    every field, including dynamically sized ones and subclasses
+    """
+    class Record(StructObject):
+        n = fields.UnsignedShort()
+        v = fields.UnsignedShort(sizeof=lambda x: 1)
+
+    class SubRecord(Record):
+        pass
+
+    data = b'\x01\x00\x01\x00'
+    Record.BYTE_ORDER = '<'
+
+    record = Record()
+    record.unpack(data)
+    assert record.n == 1
+    assert record.v == 1
+    assert record.pack() == data
+    assert SubRecord._byte_order == '<'
+
+
+def test_byte_order_instance_rejected():
+    """test that BYTE_ORDER can not be overridden on a single instance"""
+    class Record(StructObject):
+        n = fields.UnsignedShort()
+
+    record = Record()
+    with pytest.raises(AttributeError):
+        record.BYTE_ORDER = '<'
+    assert record.unpack(b'\x00\x01').n == 1
+
+
+def test_dynamic_format_cache_bounded():
+    """test that dynamically sized fields round trip at several lengths
+    through a bounded format cache
+    """
+    class Blob(StructObject):
+        length = fields.UnsignedShort()
+        data = fields.CharArrayField(sizeof=lambda x: x.length)
+
+    blob = Blob()
+    for length in range(5):
+        data = length.to_bytes(2, 'big') + b'x' * length
+        blob.unpack(data)
+        assert blob.data == (b'x' * length,)
+        assert blob.pack() == data
+
+    assert _compile_dynamic.cache_info().maxsize is not None
+
+
+def test_native_byte_order_dependant():
+    """test that a dynamically sized field whose native size differs from its
+    nominal size round trips in native byte order
+    """
+    class Native(StructObject):
+        BYTE_ORDER = '@'
+        n = fields.UnsignedCharField()
+        v = fields.LongField(sizeof=lambda x: x.n)
+
+    data = struct.pack('@B', 2) + struct.pack('@2l', 1, 2)
+
+    native = Native()
+    native.unpack(data)
+
+    assert native.v == (1, 2)
+    assert native.pack() == data
@@ -15,3 +15,25 @@ def test_statefulbytestream():
     assert repr(bs) == str(bs)
     assert bs.slice(2) == data[0:2]
     assert bs.offset == 2
+
+
+def test_statefulbytestream_slice_view():
+    """test that slicing returns a zero-copy window and advances the offset"""
+    data = b'\x00\x01\x02\x03'
+    bs = StatefulByteStream(data)
+    window = bs.slice(3)
+    assert isinstance(window, memoryview)
+    assert window == data[0:3]
+    assert bs.offset == 3
+    assert bs.slice(1).tobytes() == data[3:]
+
+
+def test_statefulbytestream_buffer():
+    """test wrapping a mutable buffer rather than a bytes object"""
+    data = bytearray(b'\x00\x01\x02\x03')
+    bs = StatefulByteStream(data)
+    assert bytes(bs) == data
+    assert bs[1] == 1
+    assert bs.slice(2, start=1) == data[1:2]
+    data[2] = 0xff
+    assert bs.slice(2) == b'\xff\x03'